@@ -0,0 +1,293 @@
+"""Contabilidad de consultas por petición, log de consultas lentas y muestreo de perfiles.
+
+Los cursores de pyodbc y el cliente de Redis se envuelven para contar sentencias,
+round trips, filas y tiempo dentro de la petición en curso (vía contextvars).
+"""
+
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from contextvars import ContextVar
+from typing import Optional
+
+logger = logging.getLogger("tickets")
+
+SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", "200"))
+SERVER_TIMING = os.getenv("SERVER_TIMING", "0").lower() in ("1", "true", "yes")
+
+_metricas: ContextVar[Optional["MetricasPeticion"]] = ContextVar("metricas_peticion", default=None)
+
+# =============================================
+# MÉTRICAS POR PETICIÓN
+# =============================================
+
+class MetricasPeticion:
+    def __init__(self):
+        self.sql_sentencias = 0
+        self.sql_round_trips = 0
+        self.sql_filas = 0
+        self.sql_ms = 0.0
+        self.redis_llamadas = 0
+        self.redis_ms = 0.0
+
+    def server_timing(self, total_ms: float) -> str:
+        return ", ".join([
+            f'db;dur={self.sql_ms:.1f};desc="{self.sql_sentencias} sentencias, '
+            f'{self.sql_round_trips} round trips, {self.sql_filas} filas"',
+            f'redis;dur={self.redis_ms:.1f};desc="{self.redis_llamadas} llamadas"',
+            f"total;dur={total_ms:.1f}",
+        ])
+
+    def campos(self) -> dict:
+        return {
+            "sql_sentencias": self.sql_sentencias,
+            "sql_round_trips": self.sql_round_trips,
+            "sql_filas": self.sql_filas,
+            "sql_ms": round(self.sql_ms, 3),
+            "redis_llamadas": self.redis_llamadas,
+            "redis_ms": round(self.redis_ms, 3),
+        }
+
+def iniciar_metricas():
+    """Activa la contabilidad para la petición actual; devuelve (métricas, token)."""
+    metricas = MetricasPeticion()
+    return metricas, _metricas.set(metricas)
+
+def finalizar_metricas(token):
+    _metricas.reset(token)
+
+def registrar_peticion(metricas: MetricasPeticion, **campos):
+    campos.update(metricas.campos())
+    logger.info(json.dumps({"evento": "peticion", **campos}, default=str), extra={"campos": campos})
+
+def _redactar(params) -> list:
+    if len(params) == 1 and isinstance(params[0], (list, tuple)):
+        params = params[0]
+    return [f"<{type(p).__name__}>" for p in params]
+
+def _registrar_consulta(sql: str, params, duracion_ms: float):
+    if duracion_ms < SLOW_QUERY_MS:
+        return
+    campos = {
+        "evento": "consulta_lenta",
+        "duracion_ms": round(duracion_ms, 3),
+        "sql": " ".join(sql.split()),
+        "parametros": _redactar(params),
+    }
+    logger.warning(json.dumps(campos), extra={"campos": campos})
+
+# =============================================
+# ENVOLTORIOS DE PYODBC
+# =============================================
+
+class CursorInstrumentado:
+    """Cuenta una sentencia por execute() y una más por cada result set extra del batch.
+
+    Así SET NOCOUNT y DECLARE, que no devuelven filas, no inflan la cuenta.
+    """
+
+    def __init__(self, cursor):
+        self._cursor = cursor
+
+    def execute(self, sql, *params):
+        inicio = time.perf_counter()
+        try:
+            self._cursor.execute(sql, *params)
+        finally:
+            duracion_ms = (time.perf_counter() - inicio) * 1000
+            metricas = _metricas.get()
+            if metricas is not None:
+                # Los result sets adicionales de un batch se suman en nextset()
+                metricas.sql_sentencias += 1
+                metricas.sql_round_trips += 1
+                metricas.sql_ms += duracion_ms
+            _registrar_consulta(sql, params, duracion_ms)
+        return self
+
+    def nextset(self):
+        hay_mas = self._cursor.nextset()
+        metricas = _metricas.get()
+        if hay_mas and metricas is not None:
+            metricas.sql_sentencias += 1
+        return hay_mas
+
+    def _contar(self, filas: int, inicio: float):
+        metricas = _metricas.get()
+        if metricas is not None:
+            metricas.sql_filas += filas
+            metricas.sql_ms += (time.perf_counter() - inicio) * 1000
+
+    def fetchone(self):
+        inicio = time.perf_counter()
+        row = self._cursor.fetchone()
+        self._contar(row is not None, inicio)
+        return row
+
+    def fetchall(self):
+        inicio = time.perf_counter()
+        rows = self._cursor.fetchall()
+        self._contar(len(rows), inicio)
+        return rows
+
+    def fetchmany(self, size=None):
+        inicio = time.perf_counter()
+        rows = self._cursor.fetchmany(size) if size is not None else self._cursor.fetchmany()
+        self._contar(len(rows), inicio)
+        return rows
+
+    def __iter__(self):
+        return iter(self.fetchone, None)
+
+    def __getattr__(self, nombre):
+        return getattr(self._cursor, nombre)
+
+class ConexionInstrumentada:
+    def __init__(self, conn):
+        self._conn = conn
+
+    def cursor(self):
+        return CursorInstrumentado(self._conn.cursor())
+
+    def commit(self):
+        inicio = time.perf_counter()
+        self._conn.commit()
+        metricas = _metricas.get()
+        if metricas is not None:
+            metricas.sql_round_trips += 1
+            metricas.sql_ms += (time.perf_counter() - inicio) * 1000
+
+    def __enter__(self):
+        self._conn.__enter__()
+        return self
+
+    def __exit__(self, *exc):
+        return self._conn.__exit__(*exc)
+
+    def __getattr__(self, nombre):
+        return getattr(self._conn, nombre)
+
+# =============================================
+# ENVOLTORIO DE REDIS
+# =============================================
+
+class RedisInstrumentado:
+    """Cuenta cada comando como un round trip; un pipeline cuenta solo al ejecutarse."""
+
+    def __init__(self, cliente):
+        self._cliente = cliente
+
+    def _medir(self, funcion, *args, **kwargs):
+        inicio = time.perf_counter()
+        try:
+            return funcion(*args, **kwargs)
+        finally:
+            metricas = _metricas.get()
+            if metricas is not None:
+                metricas.redis_llamadas += 1
+                metricas.redis_ms += (time.perf_counter() - inicio) * 1000
+
+    def pipeline(self, *args, **kwargs):
+        return _PipelineInstrumentado(self, self._cliente.pipeline(*args, **kwargs))
+
+    def __getattr__(self, nombre):
+        atributo = getattr(self._cliente, nombre)
+        if not callable(atributo):
+            return atributo
+        return lambda *args, **kwargs: self._medir(atributo, *args, **kwargs)
+
+class _PipelineInstrumentado:
+    def __init__(self, redis: RedisInstrumentado, pipeline):
+        self._redis = redis
+        self._pipeline = pipeline
+
+    def execute(self, *args, **kwargs):
+        return self._redis._medir(self._pipeline.execute, *args, **kwargs)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return self._pipeline.__exit__(*exc)
+
+    def __getattr__(self, nombre):
+        return getattr(self._pipeline, nombre)
+
+# =============================================
+# MUESTREO DE PERFILES
+# =============================================
+
+class MuestreadorPerfil:
+    """Muestrea periódicamente las pilas de todos los hilos del proceso.
+
+    Se activa y desactiva en caliente; el resultado usa el formato de pilas
+    colapsadas ("a;b;c cantidad"), compatible con flamegraph.pl y speedscope.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._lock_pilas = threading.Lock()
+        self._hilo = None
+        self._detener = threading.Event()
+        self._pilas = Counter()
+        self.muestras = 0
+        self.intervalo_ms = None
+        self.iniciado_en = None
+
+    @property
+    def activo(self) -> bool:
+        return self._hilo is not None and self._hilo.is_alive()
+
+    def iniciar(self, intervalo_ms: float = 10.0):
+        with self._lock:
+            if self.activo:
+                return False
+            self._pilas = Counter()
+            self.muestras = 0
+            self.intervalo_ms = intervalo_ms
+            self.iniciado_en = time.time()
+            self._detener.clear()
+            self._hilo = threading.Thread(target=self._muestrear, name="muestreador-perfil", daemon=True)
+            self._hilo.start()
+            return True
+
+    def detener(self):
+        with self._lock:
+            if not self.activo:
+                return False
+            self._detener.set()
+            self._hilo.join()
+            return True
+
+    def _muestrear(self):
+        propio = threading.get_ident()
+        while not self._detener.wait(self.intervalo_ms / 1000):
+            pilas = []
+            for ident, frame in sys._current_frames().items():
+                if ident == propio:
+                    continue
+                pila = []
+                while frame is not None:
+                    codigo = frame.f_code
+                    pila.append(f"{codigo.co_name} ({os.path.basename(codigo.co_filename)}:{codigo.co_firstlineno})")
+                    frame = frame.f_back
+                pilas.append(";".join(reversed(pila)))
+            with self._lock_pilas:
+                self._pilas.update(pilas)
+                self.muestras += 1
+
+    def resultado(self, top: int = 50) -> dict:
+        with self._lock_pilas:
+            pilas = self._pilas.most_common(top)
+        return {
+            "activo": self.activo,
+            "intervalo_ms": self.intervalo_ms,
+            "iniciado_en": self.iniciado_en,
+            "muestras": self.muestras,
+            "pilas": [f"{pila} {cantidad}" for pila, cantidad in pilas],
+        }
+
+muestreador = MuestreadorPerfil()
@@ -0,0 +1,213 @@
+"""Control de admisión: rate limiting por cliente en Redis y descarte de carga por proceso.
+
+El rate limiting es un token bucket atómico (script Lua) compartido entre todos
+los procesos de la API; se identifica al cliente por el usuario del JWT o, en las
+rutas de autenticación, por IP. El descarte de carga limita las peticiones en
+curso de cada proceso para responder 503 antes de agotar las conexiones a SQL Server.
+"""
+
+import hashlib
+import logging
+import math
+import os
+import threading
+from dataclasses import dataclass
+from typing import Callable, Dict, Optional, Tuple
+
+import jwt
+import redis
+from anyio import to_thread
+from starlette.responses import JSONResponse
+from starlette.routing import Match
+
+logger = logging.getLogger("tickets")
+
+# KEYS[1]: bucket; ARGV: capacidad, tokens por segundo, costo.
+# Usa el reloj de Redis para que todos los procesos compartan la misma referencia.
+TOKEN_BUCKET_LUA = """
+local capacidad = tonumber(ARGV[1])
+local recarga = tonumber(ARGV[2])
+local costo = tonumber(ARGV[3])
+local t = redis.call('TIME')
+local ahora = tonumber(t[1]) + tonumber(t[2]) / 1000000
+
+local estado = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(estado[1]) or capacidad
+local ts = tonumber(estado[2]) or ahora
+tokens = math.min(capacidad, tokens + math.max(0, ahora - ts) * recarga)
+
+local permitido = 0
+local espera = 0
+if tokens >= costo then
+    tokens = tokens - costo
+    permitido = 1
+else
+    espera = (costo - tokens) / recarga
+end
+
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'ts', tostring(ahora))
+redis.call('EXPIRE', KEYS[1], math.ceil(capacidad / recarga) + 1)
+return {permitido, tostring(espera)}
+"""
+TOKEN_BUCKET_SHA = hashlib.sha1(TOKEN_BUCKET_LUA.encode("utf-8")).hexdigest()
+
+@dataclass(frozen=True)
+class Presupuesto:
+    capacidad: int
+    por_segundo: float
+    por: str = "usuario"  # "usuario" (sub del JWT) o "ip"
+
+# Presupuestos por (método, ruta); el resto de rutas usa PRESUPUESTO_DEFECTO
+PRESUPUESTOS: Dict[Tuple[str, str], Presupuesto] = {
+    ("POST", "/auth/login"): Presupuesto(capacidad=10, por_segundo=10 / 60, por="ip"),
+    ("POST", "/auth/registro"): Presupuesto(capacidad=5, por_segundo=5 / 3600, por="ip"),
+    ("POST", "/tickets"): Presupuesto(capacidad=20, por_segundo=20 / 60),
+    ("POST", "/tickets/{ticket_id}/interacciones"): Presupuesto(capacidad=30, por_segundo=1),
+    ("PUT", "/tickets/{ticket_id}"): Presupuesto(capacidad=30, por_segundo=1),
+}
+PRESUPUESTO_DEFECTO = Presupuesto(capacidad=120, por_segundo=20)
+
+# Rutas que nunca se limitan (health checks, documentación)
+RUTAS_EXENTAS = ("/health", "/docs", "/redoc", "/openapi.json")
+
+def _saltos_proxy(valor: str) -> int:
+    """Cantidad de proxies de confianza delante de la API ("1"/"true" equivale a uno)."""
+    valor = valor.strip().lower()
+    if valor in ("true", "yes"):
+        return 1
+    return int(valor) if valor.isdigit() else 0
+
+class ControlAdmision:
+    """Estado y configuración compartidos por el middleware de un proceso."""
+
+    def __init__(
+        self,
+        obtener_redis: Callable[[], redis.Redis],
+        secreto: str,
+        algoritmo: str,
+        presupuestos: Optional[Dict[Tuple[str, str], Presupuesto]] = None,
+    ):
+        self.obtener_redis = obtener_redis
+        self.secreto = secreto
+        self.algoritmo = algoritmo
+        self.presupuestos = PRESUPUESTOS if presupuestos is None else presupuestos
+        self.rate_limit = os.getenv("RATE_LIMIT_ENABLED", "1").lower() in ("1", "true", "yes")
+        self.max_en_curso = int(os.getenv("MAX_CONCURRENT_REQUESTS", "32"))
+        self.saltos_proxy = _saltos_proxy(os.getenv("TRUST_PROXY_HEADERS", "0"))
+        self.en_curso = 0
+        self._lock = threading.Lock()
+
+    def ocupar(self) -> bool:
+        with self._lock:
+            if self.en_curso >= self.max_en_curso:
+                return False
+            self.en_curso += 1
+            return True
+
+    def liberar(self):
+        with self._lock:
+            self.en_curso -= 1
+
+    def consumir(self, clave: str, presupuesto: Presupuesto) -> Tuple[bool, float]:
+        """Consume un token del bucket; devuelve (permitido, segundos hasta el próximo token).
+
+        Es una llamada bloqueante a Redis: el middleware la ejecuta en el threadpool.
+        """
+        r = self.obtener_redis()
+        args = (1, clave, presupuesto.capacidad, presupuesto.por_segundo, 1)
+        try:
+            try:
+                permitido, espera = r.evalsha(TOKEN_BUCKET_SHA, *args)
+            except redis.exceptions.NoScriptError:
+                permitido, espera = r.eval(TOKEN_BUCKET_LUA, *args)
+        except redis.RedisError as e:
+            # Si Redis no responde se deja pasar: mejor sin límite que sin servicio
+            logger.warning("Rate limit deshabilitado temporalmente: %s", e)
+            return True, 0.0
+        return bool(int(permitido)), float(espera)
+
+class MiddlewareAdmision:
+    def __init__(self, app, control: ControlAdmision, router):
+        self.app = app
+        self.control = control
+        self.router = router
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"].startswith(RUTAS_EXENTAS):
+            await self.app(scope, receive, send)
+            return
+
+        if not self.control.ocupar():
+            respuesta = JSONResponse(
+                {"detail": "Servicio sobrecargado, intente nuevamente"},
+                status_code=503,
+                headers={"Retry-After": "1"}
+            )
+            await respuesta(scope, receive, send)
+            return
+
+        try:
+            if self.control.rate_limit:
+                rechazo = await self._limitar(scope)
+                if rechazo is not None:
+                    await rechazo(scope, receive, send)
+                    return
+            await self.app(scope, receive, send)
+        finally:
+            self.control.liberar()
+
+    async def _limitar(self, scope) -> Optional[JSONResponse]:
+        ruta = self._ruta(scope)
+        if ruta is None:
+            return None
+
+        presupuesto = self.control.presupuestos.get((scope["method"], ruta), PRESUPUESTO_DEFECTO)
+        cliente = self._usuario(scope) if presupuesto.por == "usuario" else None
+        cliente = cliente or f"ip:{self._ip(scope)}"
+        clave = f"rate:{scope['method']}:{ruta}:{cliente}"
+
+        permitido, espera = await to_thread.run_sync(self.control.consumir, clave, presupuesto)
+        if permitido:
+            return None
+
+        return JSONResponse(
+            {"detail": "Demasiadas solicitudes, intente más tarde"},
+            status_code=429,
+            headers={"Retry-After": str(max(1, math.ceil(espera)))}
+        )
+
+    def _ruta(self, scope) -> Optional[str]:
+        for route in self.router.routes:
+            match, _ = route.matches(scope)
+            if match == Match.FULL:
+                return route.path
+        return None
+
+    def _usuario(self, scope) -> Optional[str]:
+        # Solo se lee el sub del JWT; la validación completa la hace get_current_user
+        for nombre, valor in scope["headers"]:
+            if nombre == b"authorization":
+                esquema, _, token = valor.decode("latin-1").partition(" ")
+                if esquema.lower() != "bearer":
+                    return None
+                try:
+                    payload = jwt.decode(token, self.control.secreto, algorithms=[self.control.algoritmo])
+                except jwt.PyJWTError:
+                    return None
+                return f"usuario:{payload.get('sub')}" if payload.get("sub") is not None else None
+        return None
+
+    def _ip(self, scope) -> str:
+        saltos = self.control.saltos_proxy
+        if saltos:
+            # Cada proxy agrega al final la IP que vio; lo que está a la izquierda de
+            # lo agregado por los proxies de confianza lo controla el cliente.
+            ips = [
+                ip.strip()
+                for nombre, valor in scope["headers"] if nombre == b"x-forwarded-for"
+                for ip in valor.decode("latin-1").split(",") if ip.strip()
+            ]
+            if ips:
+                return ips[max(0, len(ips) - saltos)]
+        cliente = scope.get("client")
+        return cliente[0] if cliente else "desconocido"
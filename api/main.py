@@ -1,4 +1,4 @@
-from fastapi import FastAPI, HTTPException, Depends, status
+from fastapi import FastAPI, HTTPException, Depends, Request, status
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from pydantic import BaseModel, EmailStr
@@ -8,9 +8,17 @@ import pyodbc
 import redis
 import bcrypt
 import jwt
+import logging
 import os
+import time
 from enum import Enum
 
+from limites import ControlAdmision, MiddlewareAdmision
+from instrumentacion import (
+    SERVER_TIMING, ConexionInstrumentada, RedisInstrumentado,
+    finalizar_metricas, iniciar_metricas, muestreador, registrar_peticion
+)
+
 # =============================================
 # CONFIGURACIÓN
 # =============================================
@@ -21,6 +29,8 @@ app = FastAPI(
     version="2.0"
 )
 
+logging.basicConfig(level=os.getenv("LOG_LEVEL", "INFO"), format="%(asctime)s %(levelname)s %(name)s %(message)s")
+
 # JWT Configuration
 SECRET_KEY = os.getenv("JWT_SECRET", "your-secret-key-change-in-production")
 ALGORITHM = "HS256"
@@ -44,7 +54,23 @@ conn_str = (
 )
 
 # Redis Connection
-r = redis.Redis(host="redis", port=6379, decode_responses=True)
+# Timeouts cortos: si Redis no responde, el rate limit falla abierto en lugar de colgar la petición
+REDIS_TIMEOUT = float(os.getenv("REDIS_TIMEOUT", "0.5"))
+r = RedisInstrumentado(redis.Redis(
+    host="redis",
+    port=6379,
+    decode_responses=True,
+    socket_timeout=REDIS_TIMEOUT,
+    socket_connect_timeout=REDIS_TIMEOUT
+))
+
+# Rate limiting y descarte de carga (queda dentro de CORS para que los 429/503 lleven sus headers)
+control_admision = ControlAdmision(
+    obtener_redis=lambda: r,
+    secreto=SECRET_KEY,
+    algoritmo=ALGORITHM
+)
+app.add_middleware(MiddlewareAdmision, control=control_admision, router=app.router)
 
 # CORS
 app.add_middleware(
@@ -57,6 +83,40 @@ app.add_middleware(
 
 security = HTTPBearer()
 
+# Contabilidad por petición: sentencias SQL, round trips, filas y llamadas a Redis
+@app.middleware("http")
+async def medir_peticion(request: Request, call_next):
+    metricas, token = iniciar_metricas()
+    inicio = time.perf_counter()
+    
+    def registrar(estado: int) -> float:
+        total_ms = (time.perf_counter() - inicio) * 1000
+        route = request.scope.get("route")
+        registrar_peticion(
+            metricas,
+            metodo=request.method,
+            ruta=route.path if route else request.url.path,
+            estado=estado,
+            duracion_ms=round(total_ms, 3)
+        )
+        return total_ms
+    
+    try:
+        response = await call_next(request)
+    except Exception:
+        # Los 500 son los que más interesa medir: se registra lo acumulado y se propaga
+        registrar(500)
+        raise
+    finally:
+        finalizar_metricas(token)
+    
+    total_ms = registrar(response.status_code)
+    
+    if SERVER_TIMING:
+        response.headers["Server-Timing"] = metricas.server_timing(total_ms)
+    
+    return response
+
 # =============================================
 # ENUMS Y MODELOS
 # =============================================
@@ -152,6 +212,30 @@ class EstadisticasResponse(BaseModel):
     tickets_cerrados: int
     tickets_por_prioridad: dict
 
+class HistorialResponse(BaseModel):
+    historial_id: int
+    usuario_id: int
+    campo_modificado: str
+    valor_anterior: Optional[str]
+    valor_nuevo: Optional[str]
+    creado_en: datetime
+    nombre_usuario: Optional[str] = None
+
+class AdjuntoResponse(BaseModel):
+    adjunto_id: int
+    nombre_archivo: str
+    tipo_mime: Optional[str]
+    tamano_bytes: Optional[int]
+    subido_por: int
+    creado_en: datetime
+
+class TicketDetalleResponse(BaseModel):
+    ticket: TicketResponse
+    interacciones: List[InteraccionResponse]
+    siguiente_cursor: Optional[int] = None
+    historial: List[HistorialResponse]
+    adjuntos: List[AdjuntoResponse]
+
 # =============================================
 # FUNCIONES DE AUTENTICACIÓN
 # =============================================
@@ -168,19 +252,17 @@ def create_access_token(data: dict) -> str:
     to_encode.update({"exp": expire})
     return jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
 
+def conectar():
+    return pyodbc.connect(conn_str)
+
 def get_db():
-    conn = pyodbc.connect(conn_str)
+    conn = ConexionInstrumentada(conectar())
     try:
         yield conn
     finally:
         conn.close()
 
-async def get_current_user(
-    credentials: HTTPAuthorizationCredentials = Depends(security),
-    conn: pyodbc.Connection = Depends(get_db)
-) -> dict:
-    token = credentials.credentials
-    
+def decodificar_token(token: str) -> dict:
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         usuario_id: int = payload.get("sub")
@@ -188,16 +270,11 @@ async def get_current_user(
             raise HTTPException(status_code=401, detail="Token inválido")
     except jwt.ExpiredSignatureError:
         raise HTTPException(status_code=401, detail="Token expirado")
-    except jwt.JWTError:
+    except jwt.PyJWTError:
         raise HTTPException(status_code=401, detail="Token inválido")
-    
-    cursor = conn.cursor()
-    cursor.execute(
-        "SELECT usuario_id, nombre, email, rol, activo FROM Usuarios WHERE usuario_id = ?",
-        usuario_id
-    )
-    row = cursor.fetchone()
-    
+    return payload
+
+def usuario_desde_fila(row) -> dict:
     if not row or not row.activo:
         raise HTTPException(status_code=401, detail="Usuario no encontrado o inactivo")
     
@@ -209,6 +286,24 @@ async def get_current_user(
         "activo": row.activo
     }
 
+async def get_current_user(
+    credentials: HTTPAuthorizationCredentials = Depends(security),
+    conn: pyodbc.Connection = Depends(get_db)
+) -> dict:
+    usuario_id = decodificar_token(credentials.credentials)["sub"]
+    
+    cursor = conn.cursor()
+    cursor.execute(
+        "SELECT usuario_id, nombre, email, rol, activo FROM Usuarios WHERE usuario_id = ?",
+        usuario_id
+    )
+    return usuario_desde_fila(cursor.fetchone())
+
+def puede_ver_ticket(current_user: dict, usuario_id: int, asignado_a: Optional[int]) -> bool:
+    return (current_user["rol"] == "admin" or
+            usuario_id == current_user["usuario_id"] or
+            asignado_a == current_user["usuario_id"])
+
 async def require_admin(current_user: dict = Depends(get_current_user)):
     if current_user["rol"] != "admin":
         raise HTTPException(status_code=403, detail="Acceso denegado: se requiere rol de administrador")
@@ -532,11 +627,182 @@ def actualizar_ticket(
         conn.commit()
     
     # Invalidar caché
-    r.delete(f"ticket:{ticket_id}")
+    r.delete(f"ticket:{ticket_id}", f"ticket:{ticket_id}:detalle")
     
     # Retornar ticket actualizado
     return obtener_ticket(ticket_id, current_user, conn)
 
+# Un solo batch con varios result sets: usuario, ticket, ventana de
+# interacciones (keyset por interaccion_id), historial reciente y adjuntos.
+DETALLE_TICKET_SQL = """
+    SET NOCOUNT ON;
+
+    DECLARE @es_admin BIT = (
+        SELECT CASE WHEN rol = 'admin' THEN 1 ELSE 0 END FROM Usuarios WHERE usuario_id = ?
+    );
+
+    SELECT usuario_id, nombre, email, rol, activo FROM Usuarios WHERE usuario_id = ?;
+
+    SELECT t.*, u.nombre as nombre_usuario, a.nombre as asignado_nombre,
+           (SELECT COUNT(*) FROM Interacciones WHERE ticket_id = t.ticket_id) as total_interacciones
+    FROM Tickets t
+    INNER JOIN Usuarios u ON t.usuario_id = u.usuario_id
+    LEFT JOIN Usuarios a ON t.asignado_a = a.usuario_id
+    WHERE t.ticket_id = ?;
+
+    SELECT TOP (?) i.*, u.nombre as nombre_usuario
+    FROM Interacciones i
+    INNER JOIN Usuarios u ON i.usuario_id = u.usuario_id
+    WHERE i.ticket_id = ? AND i.interaccion_id > ?
+          AND (@es_admin = 1 OR i.es_interno = 0)
+    ORDER BY i.interaccion_id ASC;
+
+    SELECT TOP (?) h.*, u.nombre as nombre_usuario
+    FROM HistorialCambios h
+    INNER JOIN Usuarios u ON h.usuario_id = u.usuario_id
+    WHERE h.ticket_id = ?
+    ORDER BY h.creado_en DESC;
+
+    SELECT TOP (?) adjunto_id, nombre_archivo, tipo_mime, tamano_bytes, subido_por, creado_en
+    FROM Adjuntos
+    WHERE ticket_id = ?
+    ORDER BY creado_en DESC;
+"""
+
+DETALLE_LIMIT = 50
+DETALLE_HISTORIAL_LIMIT = 20
+DETALLE_ADJUNTOS_LIMIT = 50
+
+@app.get("/tickets/{ticket_id}/detalle", response_model=TicketDetalleResponse)
+def obtener_ticket_detalle(
+    ticket_id: int,
+    despues_de: int = 0,
+    limit: int = DETALLE_LIMIT,
+    historial_limit: int = DETALLE_HISTORIAL_LIMIT,
+    credentials: HTTPAuthorizationCredentials = Depends(security),
+    conn: pyodbc.Connection = Depends(get_db)
+):
+    payload = decodificar_token(credentials.credentials)
+    usuario_id = payload["sub"]
+    limit = max(1, min(limit, 200))
+    historial_limit = max(1, min(historial_limit, 100))
+    
+    cursor = conn.cursor()
+    
+    # Solo se cachea la primera ventana con los límites por defecto, así el hash
+    # tiene a lo sumo una variante por rol (admin ve notas internas, usuario no)
+    cache_key = f"ticket:{ticket_id}:detalle"
+    cacheable = despues_de == 0 and limit == DETALLE_LIMIT and historial_limit == DETALLE_HISTORIAL_LIMIT
+    variantes = r.hgetall(cache_key) if cacheable else {}
+    
+    # El rol del token solo decide si vale la pena consultar el rol actual: si no
+    # hay variante para él, un miss sigue siendo un único round trip (el batch)
+    if payload.get("rol") in variantes:
+        cursor.execute(
+            "SELECT usuario_id, nombre, email, rol, activo FROM Usuarios WHERE usuario_id = ?",
+            usuario_id
+        )
+        current_user = usuario_desde_fila(cursor.fetchone())
+        
+        # La variante se elige por el rol actual en la base, no por el del token
+        cached = variantes.get(current_user["rol"])
+        if cached:
+            detalle = TicketDetalleResponse.model_validate_json(cached)
+            if not puede_ver_ticket(current_user, detalle.ticket.usuario_id, detalle.ticket.asignado_a):
+                raise HTTPException(status_code=403, detail="No tiene permisos para ver este ticket")
+            return detalle
+    
+    cursor.execute(
+        DETALLE_TICKET_SQL,
+        usuario_id,
+        usuario_id,
+        ticket_id,
+        limit + 1, ticket_id, despues_de,
+        historial_limit, ticket_id,
+        DETALLE_ADJUNTOS_LIMIT, ticket_id
+    )
+    current_user = usuario_desde_fila(cursor.fetchone())
+    
+    cursor.nextset()
+    row = cursor.fetchone()
+    
+    if not row:
+        raise HTTPException(status_code=404, detail="Ticket no encontrado")
+    
+    if not puede_ver_ticket(current_user, row.usuario_id, row.asignado_a):
+        raise HTTPException(status_code=403, detail="No tiene permisos para ver este ticket")
+    
+    ticket = TicketResponse(
+        ticket_id=row.ticket_id,
+        usuario_id=row.usuario_id,
+        titulo=row.titulo,
+        descripcion=row.descripcion,
+        prioridad=row.prioridad,
+        estado=row.estado,
+        categoria=row.categoria,
+        asignado_a=row.asignado_a,
+        creado_en=row.creado_en,
+        actualizado_en=row.actualizado_en,
+        nombre_usuario=row.nombre_usuario,
+        asignado_nombre=row.asignado_nombre,
+        total_interacciones=row.total_interacciones
+    )
+    
+    cursor.nextset()
+    interacciones = cursor.fetchall()
+    
+    # Se pide una fila de más para saber si hay otra página
+    siguiente_cursor = None
+    if len(interacciones) > limit:
+        interacciones = interacciones[:limit]
+        siguiente_cursor = interacciones[-1].interaccion_id
+    
+    cursor.nextset()
+    historial = cursor.fetchall()
+    
+    cursor.nextset()
+    adjuntos = cursor.fetchall()
+    
+    detalle = TicketDetalleResponse(
+        ticket=ticket,
+        interacciones=[InteraccionResponse(
+            interaccion_id=i.interaccion_id,
+            ticket_id=i.ticket_id,
+            usuario_id=i.usuario_id,
+            mensaje=i.mensaje,
+            es_interno=i.es_interno,
+            creado_en=i.creado_en,
+            nombre_usuario=i.nombre_usuario
+        ) for i in interacciones],
+        siguiente_cursor=siguiente_cursor,
+        historial=[HistorialResponse(
+            historial_id=h.historial_id,
+            usuario_id=h.usuario_id,
+            campo_modificado=h.campo_modificado,
+            valor_anterior=h.valor_anterior,
+            valor_nuevo=h.valor_nuevo,
+            creado_en=h.creado_en,
+            nombre_usuario=h.nombre_usuario
+        ) for h in historial],
+        adjuntos=[AdjuntoResponse(
+            adjunto_id=a.adjunto_id,
+            nombre_archivo=a.nombre_archivo,
+            tipo_mime=a.tipo_mime,
+            tamano_bytes=a.tamano_bytes,
+            subido_por=a.subido_por,
+            creado_en=a.creado_en
+        ) for a in adjuntos]
+    )
+    
+    # Guardar en caché con el rol leído en el mismo batch que decidió @es_admin
+    if cacheable:
+        pipe = r.pipeline()
+        pipe.hset(cache_key, current_user["rol"], detalle.model_dump_json())
+        pipe.expire(cache_key, 300)  # 5 minutos
+        pipe.execute()
+    
+    return detalle
+
 # =============================================
 # ENDPOINTS DE INTERACCIONES
 # =============================================
@@ -571,6 +837,9 @@ def crear_interaccion(
     row = cursor.fetchone()
     conn.commit()
     
+    # Invalidar caché del detalle
+    r.delete(f"ticket:{ticket_id}:detalle")
+    
     return InteraccionResponse(
         interaccion_id=row.interaccion_id,
         ticket_id=row.ticket_id,
@@ -686,6 +955,23 @@ def listar_usuarios(
         creado_en=row.creado_en
     ) for row in cursor.fetchall()]
 
+@app.get("/admin/profiler")
+def estado_profiler(top: int = 50, admin_user: dict = Depends(require_admin)):
+    return muestreador.resultado(top)
+
+@app.post("/admin/profiler/iniciar")
+def iniciar_profiler(intervalo_ms: float = 10.0, admin_user: dict = Depends(require_admin)):
+    if not 1 <= intervalo_ms <= 1000:
+        raise HTTPException(status_code=400, detail="intervalo_ms debe estar entre 1 y 1000")
+    if not muestreador.iniciar(intervalo_ms):
+        raise HTTPException(status_code=409, detail="El profiler ya está activo")
+    return muestreador.resultado(0)
+
+@app.post("/admin/profiler/detener")
+def detener_profiler(top: int = 50, admin_user: dict = Depends(require_admin)):
+    muestreador.detener()
+    return muestreador.resultado(top)
+
 # =============================================
 # HEALTH CHECK
 # =============================================
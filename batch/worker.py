@@ -19,21 +19,39 @@ conn_str = (
     "TrustServerCertificate=yes;"
 )
 
-print("Batch Worker iniciado...")
 
-while True:
-    tarea = r.blpop("cola_batch", timeout=5)
+def conectar():
+    return pyodbc.connect(conn_str)
 
-    if tarea:
-        _, ticket_id = tarea
-        print(f"Procesando ticket {ticket_id}")
 
-        with pyodbc.connect(conn_str) as conn:
-            cursor = conn.cursor()
-            cursor.execute(
-                "INSERT INTO Interacciones (ticket_id, mensaje) VALUES (?, ?)",
-                int(ticket_id), "Procesado por batch"
-            )
-            conn.commit()
+def procesar_tarea(ticket_id):
+    print(f"Procesando ticket {ticket_id}")
 
-    time.sleep(1)
+    with conectar() as conn:
+        cursor = conn.cursor()
+        # La interacción se registra a nombre del dueño del ticket
+        cursor.execute(
+            """INSERT INTO Interacciones (ticket_id, usuario_id, mensaje)
+               SELECT ticket_id, usuario_id, ? FROM Tickets WHERE ticket_id = ?""",
+            "Procesado por batch", int(ticket_id)
+        )
+        conn.commit()
+
+    r.delete(f"ticket:{ticket_id}:detalle")
+
+
+def main():
+    print("Batch Worker iniciado...")
+
+    while True:
+        tarea = r.blpop("cola_batch", timeout=5)
+
+        if tarea:
+            _, ticket_id = tarea
+            procesar_tarea(ticket_id)
+
+        time.sleep(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,214 @@
+"""Esquema SQLite equivalente a db/init.sql y generador de datos con semilla."""
+
+import os
+import random
+import sqlite3
+from datetime import datetime, timedelta
+
+import bcrypt
+
+ESCALAS = {
+    "10k": {"usuarios": 1_000, "tickets": 10_000, "interacciones": 30_000},
+    "1m": {"usuarios": 50_000, "tickets": 1_000_000, "interacciones": 3_000_000},
+}
+
+# Todos los usuarios generados comparten esta contraseña
+PASSWORD = "Bench123!"
+
+ESQUEMA = """
+CREATE TABLE Usuarios (
+    usuario_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    nombre TEXT NOT NULL,
+    email TEXT UNIQUE NOT NULL,
+    password_hash TEXT NOT NULL,
+    rol TEXT NOT NULL DEFAULT 'usuario' CHECK (rol IN ('admin', 'usuario')),
+    activo INTEGER DEFAULT 1,
+    ultimo_acceso TEXT NULL,
+    creado_en TEXT DEFAULT (strftime('%Y-%m-%d %H:%M:%f', 'now')),
+    actualizado_en TEXT DEFAULT (strftime('%Y-%m-%d %H:%M:%f', 'now'))
+);
+
+CREATE TABLE Tickets (
+    ticket_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    usuario_id INTEGER NOT NULL REFERENCES Usuarios(usuario_id),
+    titulo TEXT NOT NULL,
+    descripcion TEXT,
+    prioridad TEXT NOT NULL DEFAULT 'media' CHECK (prioridad IN ('baja', 'media', 'alta', 'urgente')),
+    estado TEXT NOT NULL DEFAULT 'abierto' CHECK (estado IN ('abierto', 'en_proceso', 'resuelto', 'cerrado', 'cancelado')),
+    categoria TEXT,
+    asignado_a INTEGER NULL REFERENCES Usuarios(usuario_id),
+    creado_en TEXT DEFAULT (strftime('%Y-%m-%d %H:%M:%f', 'now')),
+    actualizado_en TEXT DEFAULT (strftime('%Y-%m-%d %H:%M:%f', 'now')),
+    cerrado_en TEXT NULL
+);
+
+CREATE TABLE Interacciones (
+    interaccion_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    ticket_id INTEGER NOT NULL REFERENCES Tickets(ticket_id),
+    usuario_id INTEGER NOT NULL REFERENCES Usuarios(usuario_id),
+    mensaje TEXT NOT NULL,
+    es_interno INTEGER DEFAULT 0,
+    creado_en TEXT DEFAULT (strftime('%Y-%m-%d %H:%M:%f', 'now'))
+);
+
+CREATE TABLE Adjuntos (
+    adjunto_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    ticket_id INTEGER NOT NULL REFERENCES Tickets(ticket_id),
+    nombre_archivo TEXT NOT NULL,
+    ruta_archivo TEXT NOT NULL,
+    tipo_mime TEXT,
+    tamano_bytes INTEGER,
+    subido_por INTEGER NOT NULL REFERENCES Usuarios(usuario_id),
+    creado_en TEXT DEFAULT (strftime('%Y-%m-%d %H:%M:%f', 'now'))
+);
+
+CREATE TABLE HistorialCambios (
+    historial_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    ticket_id INTEGER NOT NULL REFERENCES Tickets(ticket_id),
+    usuario_id INTEGER NOT NULL REFERENCES Usuarios(usuario_id),
+    campo_modificado TEXT NOT NULL,
+    valor_anterior TEXT,
+    valor_nuevo TEXT,
+    creado_en TEXT DEFAULT (strftime('%Y-%m-%d %H:%M:%f', 'now'))
+);
+
+CREATE INDEX idx_tickets_usuario ON Tickets(usuario_id, estado);
+CREATE INDEX idx_tickets_estado_fecha ON Tickets(estado, creado_en DESC);
+CREATE INDEX idx_tickets_asignado ON Tickets(asignado_a, estado);
+CREATE INDEX idx_tickets_prioridad ON Tickets(prioridad, estado);
+CREATE INDEX idx_interacciones_ticket_fecha ON Interacciones(ticket_id, creado_en DESC);
+CREATE INDEX idx_interacciones_usuario ON Interacciones(usuario_id);
+CREATE INDEX idx_interacciones_ticket_id ON Interacciones(ticket_id, interaccion_id);
+CREATE INDEX idx_adjuntos_ticket ON Adjuntos(ticket_id, creado_en DESC);
+CREATE INDEX idx_historial_ticket_fecha ON HistorialCambios(ticket_id, creado_en DESC);
+
+CREATE TRIGGER trg_Tickets_Historial_estado AFTER UPDATE OF estado ON Tickets
+WHEN NEW.estado != OLD.estado
+BEGIN
+    INSERT INTO HistorialCambios (ticket_id, usuario_id, campo_modificado, valor_anterior, valor_nuevo)
+    VALUES (NEW.ticket_id, IFNULL(NEW.asignado_a, NEW.usuario_id), 'estado', OLD.estado, NEW.estado);
+END;
+
+CREATE TRIGGER trg_Tickets_Historial_prioridad AFTER UPDATE OF prioridad ON Tickets
+WHEN NEW.prioridad != OLD.prioridad
+BEGIN
+    INSERT INTO HistorialCambios (ticket_id, usuario_id, campo_modificado, valor_anterior, valor_nuevo)
+    VALUES (NEW.ticket_id, IFNULL(NEW.asignado_a, NEW.usuario_id), 'prioridad', OLD.prioridad, NEW.prioridad);
+END;
+
+CREATE TRIGGER trg_Tickets_Actualizado AFTER UPDATE ON Tickets
+BEGIN
+    UPDATE Tickets SET actualizado_en = strftime('%Y-%m-%d %H:%M:%f', 'now')
+    WHERE ticket_id = NEW.ticket_id;
+END;
+"""
+
+PRIORIDADES = ["baja", "media", "alta", "urgente"]
+ESTADOS = ["abierto", "en_proceso", "resuelto", "cerrado", "cancelado"]
+CATEGORIAS = ["hardware", "software", "red", "accesos", None]
+MIMES = ["image/png", "application/pdf", "text/plain"]
+LOTE = 50_000
+
+
+def _fecha(base, rnd, dias):
+    return (base + timedelta(seconds=rnd.randrange(dias * 86400))).strftime("%Y-%m-%d %H:%M:%S.%f")
+
+
+def generar(ruta, escala="10k", semilla=42):
+    """Crea en `ruta` una base SQLite con datos reproducibles para la escala dada."""
+    tamanos = ESCALAS[escala]
+    rnd = random.Random(semilla)
+    base = datetime(2025, 1, 1)
+
+    if os.path.exists(ruta):
+        os.remove(ruta)
+
+    conn = sqlite3.connect(ruta)
+    conn.execute("PRAGMA journal_mode = WAL")
+    conn.execute("PRAGMA synchronous = OFF")
+    conn.executescript(ESQUEMA)
+
+    # Un solo hash para todos: bcrypt con el costo de producción es lo caro del login
+    password_hash = bcrypt.hashpw(PASSWORD.encode("utf-8"), bcrypt.gensalt()).decode("utf-8")
+
+    n_usuarios = tamanos["usuarios"]
+    conn.execute(
+        "INSERT INTO Usuarios (nombre, email, password_hash, rol, creado_en) VALUES (?, ?, ?, 'admin', ?)",
+        ("Administrador", "admin@bench.soporte.com", password_hash, _fecha(base, rnd, 1)),
+    )
+    conn.executemany(
+        "INSERT INTO Usuarios (nombre, email, password_hash, rol, creado_en) VALUES (?, ?, ?, 'usuario', ?)",
+        (
+            (f"Usuario {i}", f"usuario{i}@bench.soporte.com", password_hash, _fecha(base, rnd, 30))
+            for i in range(2, n_usuarios + 1)
+        ),
+    )
+
+    n_tickets = tamanos["tickets"]
+    for inicio in range(1, n_tickets + 1, LOTE):
+        conn.executemany(
+            """INSERT INTO Tickets (usuario_id, titulo, descripcion, prioridad, estado, categoria,
+                                   asignado_a, creado_en, actualizado_en)
+               VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)""",
+            (
+                (
+                    rnd.randint(2, n_usuarios),
+                    f"Ticket {i}",
+                    f"Descripción del ticket {i}",
+                    rnd.choice(PRIORIDADES),
+                    rnd.choice(ESTADOS),
+                    rnd.choice(CATEGORIAS),
+                    1 if rnd.random() < 0.3 else None,
+                    fecha := _fecha(base, rnd, 365),
+                    fecha,
+                )
+                for i in range(inicio, min(inicio + LOTE, n_tickets + 1))
+            ),
+        )
+
+    n_interacciones = tamanos["interacciones"]
+    for inicio in range(0, n_interacciones, LOTE):
+        conn.executemany(
+            "INSERT INTO Interacciones (ticket_id, usuario_id, mensaje, es_interno, creado_en) VALUES (?, ?, ?, ?, ?)",
+            (
+                (
+                    rnd.randint(1, n_tickets),
+                    rnd.randint(1, n_usuarios),
+                    f"Mensaje {i}",
+                    int(rnd.random() < 0.1),
+                    _fecha(base, rnd, 365),
+                )
+                for i in range(inicio, min(inicio + LOTE, n_interacciones))
+            ),
+        )
+
+    # Historial y adjuntos en una fracción de los tickets, para que el detalle tenga algo que leer
+    conn.executemany(
+        """INSERT INTO HistorialCambios (ticket_id, usuario_id, campo_modificado, valor_anterior, valor_nuevo, creado_en)
+           VALUES (?, ?, 'estado', 'abierto', ?, ?)""",
+        (
+            (rnd.randint(1, n_tickets), 1, rnd.choice(ESTADOS[1:]), _fecha(base, rnd, 365))
+            for _ in range(n_tickets // 5)
+        ),
+    )
+    conn.executemany(
+        """INSERT INTO Adjuntos (ticket_id, nombre_archivo, ruta_archivo, tipo_mime, tamano_bytes, subido_por, creado_en)
+           VALUES (?, ?, ?, ?, ?, ?, ?)""",
+        (
+            (
+                ticket_id := rnd.randint(1, n_tickets),
+                f"adjunto_{i}.bin",
+                f"/adjuntos/{ticket_id}/adjunto_{i}.bin",
+                rnd.choice(MIMES),
+                rnd.randint(1_000, 5_000_000),
+                rnd.randint(1, n_usuarios),
+                _fecha(base, rnd, 365),
+            )
+            for i in range(n_tickets // 10)
+        ),
+    )
+
+    conn.commit()
+    conn.execute("ANALYZE")
+    conn.close()
+    return tamanos
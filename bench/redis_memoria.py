@@ -0,0 +1,180 @@
+"""Sustituto en proceso de redis.Redis (decode_responses=True) para los benchmarks.
+
+Cubre los comandos que usan api/main.py y batch/worker.py. blpop no bloquea:
+si la lista está vacía devuelve None de inmediato. Los scripts Lua no se
+interpretan: cada script se registra con una función Python equivalente.
+"""
+
+import hashlib
+import threading
+import time
+
+
+class RedisEnMemoria:
+    def __init__(self):
+        self._datos = {}
+        self._expira = {}
+        self._lock = threading.RLock()
+        self._scripts = {}
+
+    def _vigente(self, clave):
+        expira = self._expira.get(clave)
+        if expira is not None and expira <= time.monotonic():
+            self._datos.pop(clave, None)
+            self._expira.pop(clave, None)
+        return clave in self._datos
+
+    def ping(self):
+        return True
+
+    def flushall(self):
+        with self._lock:
+            self._datos.clear()
+            self._expira.clear()
+        return True
+
+    def get(self, clave):
+        with self._lock:
+            return self._datos[clave] if self._vigente(clave) else None
+
+    def set(self, clave, valor, ex=None):
+        with self._lock:
+            self._datos[clave] = str(valor)
+            self._expira.pop(clave, None)
+            if ex is not None:
+                self.expire(clave, ex)
+        return True
+
+    def setex(self, clave, segundos, valor):
+        return self.set(clave, valor, ex=segundos)
+
+    def incr(self, clave, cantidad=1):
+        with self._lock:
+            valor = int(self.get(clave) or 0) + cantidad
+            self._datos[clave] = str(valor)
+            return valor
+
+    def delete(self, *claves):
+        with self._lock:
+            borradas = 0
+            for clave in claves:
+                if self._vigente(clave):
+                    borradas += 1
+                self._datos.pop(clave, None)
+                self._expira.pop(clave, None)
+            return borradas
+
+    def expire(self, clave, segundos):
+        with self._lock:
+            if not self._vigente(clave):
+                return False
+            self._expira[clave] = time.monotonic() + segundos
+            return True
+
+    def hget(self, clave, campo):
+        with self._lock:
+            if not self._vigente(clave):
+                return None
+            return self._datos[clave].get(campo)
+
+    def hgetall(self, clave):
+        with self._lock:
+            return dict(self._datos[clave]) if self._vigente(clave) else {}
+
+    def hset(self, clave, campo, valor):
+        with self._lock:
+            if not self._vigente(clave):
+                self._datos[clave] = {}
+            nuevo = campo not in self._datos[clave]
+            self._datos[clave][campo] = str(valor)
+            return int(nuevo)
+
+    def rpush(self, clave, *valores):
+        with self._lock:
+            if not self._vigente(clave):
+                self._datos[clave] = []
+            self._datos[clave].extend(str(v) for v in valores)
+            return len(self._datos[clave])
+
+    def llen(self, clave):
+        with self._lock:
+            return len(self._datos[clave]) if self._vigente(clave) else 0
+
+    def blpop(self, claves, timeout=0):
+        if isinstance(claves, str):
+            claves = [claves]
+        with self._lock:
+            for clave in claves:
+                if self._vigente(clave) and self._datos[clave]:
+                    valor = self._datos[clave].pop(0)
+                    if not self._datos[clave]:
+                        self.delete(clave)
+                    return clave, valor
+        return None
+
+    def registrar_script(self, lua, funcion):
+        """Asocia un script Lua a `funcion(redis, keys, args)`, que lo emula."""
+        self._scripts[hashlib.sha1(lua.encode("utf-8")).hexdigest()] = funcion
+
+    def evalsha(self, sha, numkeys, *keys_y_args):
+        funcion = self._scripts.get(sha)
+        if funcion is None:
+            raise NotImplementedError(f"Script sin emulación registrada: {sha}")
+        with self._lock:
+            return funcion(self, list(keys_y_args[:numkeys]), list(keys_y_args[numkeys:]))
+
+    def eval(self, lua, numkeys, *keys_y_args):
+        return self.evalsha(hashlib.sha1(lua.encode("utf-8")).hexdigest(), numkeys, *keys_y_args)
+
+    def pipeline(self, transaction=True):
+        return _Pipeline(self)
+
+
+def token_bucket(redis, keys, args):
+    """Emulación de limites.TOKEN_BUCKET_LUA."""
+    capacidad, recarga, costo = (float(a) for a in args)
+    ahora = time.time()
+
+    estado = redis._datos.get(keys[0]) if redis._vigente(keys[0]) else None
+    tokens = float(estado["tokens"]) if estado else capacidad
+    ts = float(estado["ts"]) if estado else ahora
+    tokens = min(capacidad, tokens + max(0.0, ahora - ts) * recarga)
+
+    permitido, espera = 0, 0.0
+    if tokens >= costo:
+        tokens -= costo
+        permitido = 1
+    else:
+        espera = (costo - tokens) / recarga
+
+    redis.hset(keys[0], "tokens", tokens)
+    redis.hset(keys[0], "ts", ahora)
+    redis.expire(keys[0], int(capacidad / recarga) + 2)
+    return [permitido, str(espera)]
+
+
+class _Pipeline:
+    def __init__(self, redis):
+        self._redis = redis
+        self._comandos = []
+
+    def __getattr__(self, nombre):
+        metodo = getattr(self._redis, nombre)
+
+        def encolar(*args, **kwargs):
+            self._comandos.append((metodo, args, kwargs))
+            return self
+
+        return encolar
+
+    def execute(self):
+        with self._redis._lock:
+            resultados = [metodo(*args, **kwargs) for metodo, args, kwargs in self._comandos]
+        self._comandos = []
+        return resultados
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self._comandos = []
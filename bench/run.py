@@ -0,0 +1,311 @@
+"""Benchmark y prueba de carga de la API y del batch worker, sin SQL Server ni Redis.
+
+Uso:
+    python bench/run.py --escala 10k --iteraciones 200
+    python bench/run.py --escala 10k --comparar bench/resultados/anterior.json
+
+La API y el worker se ejecutan tal cual; solo se reemplazan sus `conectar()` y
+`r` por los sustitutos SQLite y Redis en memoria. Los resultados se guardan en
+JSON para poder comparar corridas.
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import logging
+import math
+import os
+import platform
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import types
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [os.path.join(RAIZ, "api"), os.path.join(RAIZ, "batch"), os.path.dirname(os.path.abspath(__file__))]
+
+# El wheel de pyodbc necesita libodbc del sistema; como conectar() se reemplaza por
+# SQLite, sin unixODBC basta un módulo con los nombres que usan main y worker
+try:
+    import pyodbc  # noqa: F401
+except ImportError:
+    def _sin_odbc(*args, **kwargs):
+        raise RuntimeError("pyodbc no disponible: el benchmark usa el sustituto SQLite")
+
+    sys.modules["pyodbc"] = types.ModuleType("pyodbc")
+    sys.modules["pyodbc"].connect = _sin_odbc
+    sys.modules["pyodbc"].Connection = object
+
+from fastapi.testclient import TestClient  # noqa: E402
+
+import main  # noqa: E402
+import worker  # noqa: E402
+from instrumentacion import RedisInstrumentado  # noqa: E402
+from limites import TOKEN_BUCKET_LUA  # noqa: E402
+from datos import ESCALAS, PASSWORD, generar  # noqa: E402
+from redis_memoria import RedisEnMemoria, token_bucket  # noqa: E402
+from sqlite_db import Conexion  # noqa: E402
+
+DIR_DATOS = os.path.join(RAIZ, "bench", ".datos")
+DIR_RESULTADOS = os.path.join(RAIZ, "bench", "resultados")
+POR_PAGINA = 20
+
+
+# =============================================
+# ESCENARIOS
+# =============================================
+
+def _login(cliente, rnd, ctx):
+    email = f"usuario{rnd.randint(2, ctx['usuarios'])}@bench.soporte.com"
+    return cliente.post("/auth/login", json={"email": email, "password": PASSWORD})
+
+def _listar_tickets(cliente, rnd, ctx):
+    return cliente.get("/tickets", params={"page": 1, "limit": POR_PAGINA}, headers=ctx["admin"])
+
+def _listar_tickets_profundo(cliente, rnd, ctx):
+    # Último 10% de páginas: el costo de OFFSET crece con la profundidad
+    paginas = max(1, ctx["tickets"] // POR_PAGINA)
+    pagina = rnd.randint(max(1, paginas - paginas // 10), paginas)
+    return cliente.get("/tickets", params={"page": pagina, "limit": POR_PAGINA}, headers=ctx["admin"])
+
+def _detalle_ticket(cliente, rnd, ctx):
+    return cliente.get(f"/tickets/{rnd.randint(1, ctx['tickets'])}/detalle", headers=ctx["admin"])
+
+def _crear_interaccion(cliente, rnd, ctx):
+    return cliente.post(
+        f"/tickets/{rnd.randint(1, ctx['tickets'])}/interacciones",
+        json={"mensaje": "Mensaje de benchmark"},
+        headers=ctx["admin"]
+    )
+
+def _estadisticas(cliente, rnd, ctx):
+    return cliente.get("/admin/estadisticas", headers=ctx["admin"])
+
+ESCENARIOS = {
+    "login": _login,
+    "listar_tickets": _listar_tickets,
+    "listar_tickets_profundo": _listar_tickets_profundo,
+    "detalle_ticket": _detalle_ticket,
+    "crear_interaccion": _crear_interaccion,
+    "estadisticas": _estadisticas,
+    "batch_drenado": None,
+}
+
+
+# =============================================
+# MEDICIÓN
+# =============================================
+
+def percentil(valores, p):
+    """Percentil por rango más cercano sobre una lista ya ordenada."""
+    if not valores:
+        return None
+    indice = max(0, min(len(valores) - 1, math.ceil(p / 100 * len(valores)) - 1))
+    return valores[indice]
+
+def resumir(latencias, errores, duracion):
+    latencias = sorted(latencias)
+    ms = lambda s: round(s * 1000, 3) if s is not None else None
+    return {
+        "operaciones": len(latencias),
+        "errores": errores,
+        "duracion_s": round(duracion, 3),
+        "throughput_ops_s": round(len(latencias) / duracion, 2) if duracion else None,
+        "latencia_ms": {
+            "p50": ms(percentil(latencias, 50)),
+            "p95": ms(percentil(latencias, 95)),
+            "p99": ms(percentil(latencias, 99)),
+            "media": ms(sum(latencias) / len(latencias)) if latencias else None,
+            "max": ms(latencias[-1]) if latencias else None,
+        },
+    }
+
+def medir_http(operacion, ctx, iteraciones, concurrencia, semilla, calentamiento):
+    latencias = []
+    errores = 0
+    lock = threading.Lock()
+
+    def hilo(n):
+        nonlocal errores
+        rnd = random.Random(semilla + n)
+        propias = []
+        fallos = 0
+        try:
+            with TestClient(main.app) as cliente:
+                for _ in range(calentamiento):
+                    operacion(cliente, rnd, ctx)
+                barrera.wait()
+                for _ in range(iteraciones // concurrencia + (n < iteraciones % concurrencia)):
+                    inicio = time.perf_counter()
+                    respuesta = operacion(cliente, rnd, ctx)
+                    propias.append(time.perf_counter() - inicio)
+                    if respuesta.status_code >= 400:
+                        fallos += 1
+        except BaseException:
+            # Liberar a los demás hilos en lugar de dejarlos colgados en la barrera
+            barrera.abort()
+            raise
+        with lock:
+            latencias.extend(propias)
+            errores += fallos
+
+    barrera = threading.Barrier(concurrencia + 1)
+    with ThreadPoolExecutor(max_workers=concurrencia) as pool:
+        futuros = [pool.submit(hilo, n) for n in range(concurrencia)]
+        try:
+            barrera.wait()
+        except threading.BrokenBarrierError:
+            pass
+        inicio = time.perf_counter()
+        for futuro in futuros:
+            futuro.result()
+        duracion = time.perf_counter() - inicio
+
+    return resumir(latencias, errores, duracion)
+
+def medir_batch(ctx, iteraciones, semilla):
+    rnd = random.Random(semilla)
+    worker.r.rpush("cola_batch", *(rnd.randint(1, ctx["tickets"]) for _ in range(iteraciones)))
+
+    latencias = []
+    errores = 0
+    inicio = time.perf_counter()
+    # El worker real duerme 1 s entre tareas; aquí se mide solo el procesamiento
+    with contextlib.redirect_stdout(io.StringIO()):
+        while True:
+            tarea = worker.r.blpop("cola_batch", timeout=0)
+            if not tarea:
+                break
+            t0 = time.perf_counter()
+            try:
+                worker.procesar_tarea(tarea[1])
+            except Exception:
+                errores += 1
+            latencias.append(time.perf_counter() - t0)
+    duracion = time.perf_counter() - inicio
+
+    return resumir(latencias, errores, duracion)
+
+
+# =============================================
+# PREPARACIÓN Y REPORTE
+# =============================================
+
+def preparar_base(escala, semilla, directorio):
+    """Genera (o reutiliza) la base sembrada y devuelve una copia desechable para la corrida."""
+    os.makedirs(DIR_DATOS, exist_ok=True)
+    semilla_db = os.path.join(DIR_DATOS, f"{escala}-{semilla}.sqlite")
+    if not os.path.exists(semilla_db):
+        print(f"Generando datos {escala} (semilla {semilla})...")
+        generar(semilla_db + ".tmp", escala, semilla)
+        os.replace(semilla_db + ".tmp", semilla_db)
+
+    ruta = os.path.join(directorio, "bench.sqlite")
+    shutil.copyfile(semilla_db, ruta)
+    return ruta
+
+def commit_actual():
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=RAIZ, stderr=subprocess.DEVNULL, text=True
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def comparar(base, actual):
+    print(f"\n{'escenario':<26}{'p50 ms':>32}{'p99 ms':>32}{'ops/s':>32}")
+    for nombre, res in actual["escenarios"].items():
+        previo = base.get("escenarios", {}).get(nombre)
+        if not previo:
+            continue
+        columnas = []
+        for a, b in (
+            (previo["latencia_ms"]["p50"], res["latencia_ms"]["p50"]),
+            (previo["latencia_ms"]["p99"], res["latencia_ms"]["p99"]),
+            (previo["throughput_ops_s"], res["throughput_ops_s"]),
+        ):
+            delta = f"{(b - a) / a * 100:+.1f}%" if a and b is not None else "n/a"
+            columnas.append(f"{a} → {b} ({delta})")
+        print(f"{nombre:<26}" + "".join(f"{c:>32}" for c in columnas))
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--escala", choices=sorted(ESCALAS), default="10k")
+    parser.add_argument("--semilla", type=int, default=42)
+    parser.add_argument("--iteraciones", type=int, default=200)
+    parser.add_argument("--concurrencia", type=int, default=1)
+    parser.add_argument("--calentamiento", type=int, default=5)
+    parser.add_argument("--con-limites", action="store_true",
+                        help="Aplicar rate limiting (por defecto se desactiva para medir solo los endpoints)")
+    parser.add_argument("--escenarios", nargs="+", choices=list(ESCENARIOS), default=list(ESCENARIOS))
+    parser.add_argument("--salida", help="Archivo JSON de resultados (por defecto bench/resultados/<fecha>.json)")
+    parser.add_argument("--comparar", help="JSON de una corrida anterior para mostrar diferencias")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directorio:
+        ruta = preparar_base(args.escala, args.semilla, directorio)
+
+        redis_memoria = RedisEnMemoria()
+        redis_memoria.registrar_script(TOKEN_BUCKET_LUA, token_bucket)
+        main.conectar = worker.conectar = lambda: Conexion(ruta)
+        main.r = RedisInstrumentado(redis_memoria)
+        worker.r = redis_memoria
+        main.control_admision.rate_limit = args.con_limites
+        main.control_admision.max_en_curso = max(main.control_admision.max_en_curso, args.concurrencia)
+        # El log por petición se sigue generando, pero solo se muestran las consultas lentas
+        logging.getLogger("tickets").setLevel(logging.WARNING)
+        logging.getLogger("httpx").setLevel(logging.WARNING)
+
+        ctx = dict(ESCALAS[args.escala])
+        ctx["admin"] = {"Authorization": f"Bearer {main.create_access_token({'sub': 1, 'rol': 'admin'})}"}
+
+        resultados = {}
+        for nombre in args.escenarios:
+            redis_memoria.flushall()
+            print(f"{nombre}...", end=" ", flush=True)
+            if ESCENARIOS[nombre] is None:
+                resultados[nombre] = medir_batch(ctx, args.iteraciones, args.semilla)
+            else:
+                resultados[nombre] = medir_http(
+                    ESCENARIOS[nombre], ctx, args.iteraciones, args.concurrencia,
+                    args.semilla, args.calentamiento
+                )
+            lat = resultados[nombre]["latencia_ms"]
+            print(f"{resultados[nombre]['throughput_ops_s']} ops/s, "
+                  f"p50 {lat['p50']} ms, p95 {lat['p95']} ms, p99 {lat['p99']} ms, "
+                  f"errores {resultados[nombre]['errores']}")
+
+    corrida = {
+        "meta": {
+            "fecha": datetime.now().isoformat(timespec="seconds"),
+            "commit": commit_actual(),
+            "escala": args.escala,
+            "semilla": args.semilla,
+            "iteraciones": args.iteraciones,
+            "concurrencia": args.concurrencia,
+            "con_limites": args.con_limites,
+            "python": platform.python_version(),
+            "plataforma": platform.platform(),
+        },
+        "escenarios": resultados,
+    }
+
+    salida = args.salida or os.path.join(DIR_RESULTADOS, f"{datetime.now():%Y%m%d-%H%M%S}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(salida)), exist_ok=True)
+    with open(salida, "w") as f:
+        json.dump(corrida, f, indent=2, ensure_ascii=False)
+    print(f"\nResultados guardados en {salida}")
+
+    if args.comparar:
+        with open(args.comparar) as f:
+            comparar(json.load(f), corrida)
+
+if __name__ == "__main__":
+    main_cli()
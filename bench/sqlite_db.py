@@ -0,0 +1,161 @@
+"""Sustituto de pyodbc sobre SQLite para correr los benchmarks sin SQL Server.
+
+Solo implementa lo que usan api/main.py y batch/worker.py: filas con acceso por
+atributo, varios result sets por batch (nextset) y una traducción mínima de
+T-SQL (OUTPUT INSERTED, TOP, OFFSET/FETCH, DECLARE, SET NOCOUNT, SYSDATETIME).
+"""
+
+import re
+import sqlite3
+from datetime import datetime
+from functools import lru_cache
+
+_PARAM = re.compile(r"\?")
+_OUTPUT = re.compile(r"\bOUTPUT\s+(.+?)\s+(VALUES|SELECT)\b", re.IGNORECASE | re.DOTALL)
+_TOP = re.compile(r"^(\s*SELECT)\s+TOP\s*\(\s*(:p\d+|\d+)\s*\)", re.IGNORECASE)
+_OFFSET_FETCH = re.compile(
+    r"\bOFFSET\s+(:p\d+|\d+)\s+ROWS\s+FETCH\s+NEXT\s+(:p\d+|\d+)\s+ROWS\s+ONLY\b",
+    re.IGNORECASE,
+)
+_DECLARE = re.compile(r"^\s*DECLARE\s+(@\w+)\s+\w+(?:\(\d+\))?\s*=\s*(.+)$", re.IGNORECASE | re.DOTALL)
+_SET_NOCOUNT = re.compile(r"^\s*SET\s+NOCOUNT\s+(ON|OFF)\s*$", re.IGNORECASE)
+
+
+def _sysdatetime():
+    return datetime.now().strftime("%Y-%m-%d %H:%M:%S.%f")
+
+
+@lru_cache(maxsize=256)
+def traducir(sql):
+    """Convierte un batch T-SQL en sentencias SQLite con parámetros nombrados :pN."""
+    contador = iter(range(1, sql.count("?") + 1))
+    sql = _PARAM.sub(lambda _: f":p{next(contador)}", sql)
+
+    sentencias = []
+    for sentencia in sql.split(";"):
+        if not sentencia.strip() or _SET_NOCOUNT.match(sentencia):
+            continue
+
+        declare = _DECLARE.match(sentencia)
+        if declare:
+            sentencias.append(("declare", declare.group(1), f"SELECT {declare.group(2)}"))
+            continue
+
+        output = _OUTPUT.search(sentencia)
+        if output:
+            columnas = re.sub(r"\bINSERTED\.", "", output.group(1), flags=re.IGNORECASE)
+            sentencia = (
+                sentencia[:output.start()] + output.group(2) + sentencia[output.end():]
+                + f" RETURNING {columnas}"
+            )
+
+        top = _TOP.match(sentencia)
+        if top:
+            sentencia = f"{top.group(1)}{sentencia[top.end():]} LIMIT {top.group(2)}"
+
+        sentencia = _OFFSET_FETCH.sub(r"LIMIT \2 OFFSET \1", sentencia)
+        sentencias.append(("sql", None, sentencia))
+
+    return tuple(sentencias)
+
+
+class Fila(tuple):
+    """Fila con acceso por atributo, como pyodbc.Row."""
+
+    _columnas = {}
+
+    def __getattr__(self, nombre):
+        try:
+            return self[self._columnas[nombre]]
+        except KeyError:
+            raise AttributeError(nombre) from None
+
+
+@lru_cache(maxsize=256)
+def _clase_fila(nombres):
+    columnas = {}
+    for i, nombre in enumerate(nombres):
+        columnas.setdefault(nombre, i)
+    return type("Fila", (Fila,), {"_columnas": columnas})
+
+
+class Cursor:
+    def __init__(self, conn):
+        self._conn = conn
+        self._resultados = []
+        self.rowcount = -1
+
+    def execute(self, sql, *params):
+        if len(params) == 1 and isinstance(params[0], (list, tuple)):
+            params = params[0]
+        valores = {f"p{i}": v for i, v in enumerate(params, start=1)}
+
+        self._resultados = []
+        self.rowcount = -1
+        variables = {}
+
+        for tipo, variable, sentencia in traducir(sql):
+            for nombre, valor in variables.items():
+                sentencia = sentencia.replace(nombre, valor)
+
+            cur = self._conn.execute(sentencia, valores)
+            if tipo == "declare":
+                fila = cur.fetchone()
+                variables[variable] = "NULL" if fila is None or fila[0] is None else repr(fila[0])
+            elif cur.description is not None:
+                clase = _clase_fila(tuple(col[0] for col in cur.description))
+                self._resultados.append([clase(f) for f in cur.fetchall()])
+            else:
+                self.rowcount = cur.rowcount
+
+        return self
+
+    def fetchone(self):
+        if not self._resultados or not self._resultados[0]:
+            return None
+        return self._resultados[0].pop(0)
+
+    def fetchall(self):
+        if not self._resultados:
+            return []
+        filas, self._resultados[0] = self._resultados[0], []
+        return filas
+
+    def nextset(self):
+        if len(self._resultados) <= 1:
+            self._resultados = []
+            return None
+        self._resultados.pop(0)
+        return True
+
+    def close(self):
+        self._resultados = []
+
+
+class Conexion:
+    def __init__(self, ruta):
+        self._conn = sqlite3.connect(ruta, timeout=30, check_same_thread=False)
+        self._conn.create_function("SYSDATETIME", 0, _sysdatetime)
+        self._conn.execute("PRAGMA foreign_keys = ON")
+
+    def cursor(self):
+        return Cursor(self._conn)
+
+    def commit(self):
+        self._conn.commit()
+
+    def rollback(self):
+        self._conn.rollback()
+
+    def close(self):
+        self._conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        # Igual que pyodbc: confirma o revierte, pero no cierra
+        if exc_type is None:
+            self.commit()
+        else:
+            self.rollback()
@@ -119,6 +119,10 @@ CREATE NONCLUSTERED INDEX idx_tickets_prioridad ON Tickets(prioridad, estado);
 -- Índices en Interacciones
 CREATE NONCLUSTERED INDEX idx_interacciones_ticket_fecha ON Interacciones(ticket_id, creado_en DESC);
 CREATE NONCLUSTERED INDEX idx_interacciones_usuario ON Interacciones(usuario_id);
+CREATE NONCLUSTERED INDEX idx_interacciones_ticket_id ON Interacciones(ticket_id, interaccion_id);
+
+-- Índices en Adjuntos
+CREATE NONCLUSTERED INDEX idx_adjuntos_ticket ON Adjuntos(ticket_id, creado_en DESC);
 
 -- Índices en Usuarios
 CREATE NONCLUSTERED INDEX idx_usuarios_email ON Usuarios(email) WHERE activo = 1;